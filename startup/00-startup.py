@@ -2,6 +2,7 @@ print(f"Loading {__file__!r} ...")
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
 from tiled.client import from_profile
@@ -108,11 +109,15 @@ def warmup_hdf5_plugins(detectors):
     This is necessary for when the corresponding IOC restarts we have to trigger one image
     for the hdf5 plugin to work correctly, else we get file writing errors.
 
+    The warm-ups only wait on CA, and each one touches only its own
+    detector's PVs, so they are run concurrently: the wall time is that of
+    the slowest camera instead of the sum over all of them.
+
     Parameter:
     ----------
     detectors: list
     """
-    for det in detectors:
+    def _warmup_one(det):
         _array_size = det.hdf5.array_size.get()
         if 0 in [_array_size.height, _array_size.width] and hasattr(det, "hdf5"):
             print(f"\n  Warming up HDF5 plugin for {det.name} as the array_size={_array_size}...")
@@ -121,6 +126,11 @@ def warmup_hdf5_plugins(detectors):
         else:
             print(f"\n  Warming up of the HDF5 plugin is not needed for {det.name} as the array_size={_array_size}.")
 
+    if detectors:
+        with ThreadPoolExecutor(max_workers=len(detectors)) as ex:
+            # consume the iterator so exceptions propagate
+            list(ex.map(_warmup_one, detectors))
+
 
 def auto_alignment_mode(envvar="AUTOALIGNMENT", default="no"):
     """Enable auto-alignment mode.
@@ -1,5 +1,9 @@
 print(f"Loading {__file__!r} ...")
 
+import types
+
+import numpy as np
+
 
 # Element Format: element_edge, lower case only!!!
 # Data in (): (roi low bin, rio width, absorption edge energy in eV)
@@ -42,6 +46,14 @@ element_to_roi = {
     "w":(200,218),
 }
 
+# Freeze the table so a stray assignment cannot silently override an entry,
+# and precompute the lower-cased lookup once instead of on every rois() call.
+# The values are stored as small int16 arrays so downstream spectrum
+# slicing/summing works on a canonical numpy form; tuple unpacking
+# (lo, hi = rois(...)) keeps working.
+element_to_roi = types.MappingProxyType(element_to_roi)
+_ROI_LC = {k.lower(): np.asarray(v, dtype=np.int16) for k, v in element_to_roi.items()}
+
 # Element Format: element_edge, lower case only!!!
 # Data in (): (roi low bin, rio width, absorption edge energy in eV)
 element_to_roi_smart = {
@@ -94,48 +106,15 @@ element_to_roi_smart = {
 
 
 def rois(element):
-   return element_to_roi[element.lower()]
-
-    # if element == 's':
-    #    roi = [221, 239]
-    # elif element == 'p':
-    #     roi = [192, 210]
-    # elif element == 'ca':
-    #     roi = []
-    # elif element == 'k':
-    #     roi = []
-    # elif element == 'ar':
-    #     roi = []
-    # elif element == 'Cl':
-    #     roi = [253, 271]
-    # elif element == 'si':
-    #     roi = []
-    # elif element == 'al':
-    #     roi = []
-    # elif element == 'mg':
-    #     roi = []
-    # elif element == 'pd':
-    #     roi = [274, 292]
-    # elif element == 'au':
-    #     roi = [202, 220]
-    # elif element == 'u':
-    #     roi = []
-    # elif element == 'ru_croft':
-    #     roi = [240, 280]
-    # elif element == 'y_croft':
-    #     roi = [170, 205]
-    # elif element == 'zr_croft':
-    #     roi = [190, 225]
-    # elif element == 'zr_sahiner':
-    #     roi = [195, 225]
-    # else:
-    #     roi = []
-    
-    # return roi
+    return _ROI_LC[element if element.islower() else element.lower()]
 
 
+# If this is ever reinstated, keep the matplotlib import inside the function:
+# importing matplotlib at module scope costs ~200 ms and tens of MB on every
+# bsui startup.
 #def plotScans():
-    #    h = db[-1]
+    #import matplotlib.pyplot as pp
+    #h = db[-1]
     #E = h.table()['mono_energy']
     #I0 = h.table()['I0']
     #If = h.table()['xs_channel1_rois_roi01_value_sum']
@@ -3,9 +3,11 @@ print(f"Loading {__file__!r} ...")
 from ophyd import EpicsSignal, EpicsSignalRO
 
 # Those parameters are used by suspenders in 98-suspenders.py:
-ring_current = EpicsSignalRO('SR:OPS-BI{DCCT:1}I:Real-I', name="ring_current")
-solenoid_v = EpicsSignal('XF:08BMES-BI{PSh:1-BPM:4}V-I', name="solenoid_v")
+# auto_monitor keeps the values updated via CA subscriptions, so each
+# suspender check is a local cache read instead of a fresh CA get.
+ring_current = EpicsSignalRO('SR:OPS-BI{DCCT:1}I:Real-I', name="ring_current", auto_monitor=True)
+solenoid_v = EpicsSignal('XF:08BMES-BI{PSh:1-BPM:4}V-I', name="solenoid_v", auto_monitor=True)
 #I0 = EpicsSignal("XF:08BM-ES{IO:2}AI:1-I")
-I0 = EpicsSignal("XF:08BMES-BI{PSh:1-BPM:3}V-I", name="I0")
+I0 = EpicsSignal("XF:08BMES-BI{PSh:1-BPM:3}V-I", name="I0", auto_monitor=True)
 #H_feedback_top = EpicsSignal('XF:08BM-ES{IO:2}AI:2-I')
 #H_feedback_bottom = EpicsSignal('XF:08BM-ES{IO:2}AI:3-I')
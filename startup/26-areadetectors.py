@@ -5,7 +5,9 @@ print(f"Loading {__file__!r} ...")
 This file came from https://github.com/NSLS-II-HXN/flyer_profile/blob/master/startup/10-detectors.py
 with minor modifications of the PV names and cam names.
 """
+import threading
 import time as ttime  # tea time
+from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
 from types import SimpleNamespace
 from datetime import datetime
@@ -22,6 +24,7 @@ from ophyd.areadetector.filestore_mixins import (FileStoreTIFFIterativeWrite,
 from ophyd.areadetector.plugins import (TIFFPlugin_V34 as TIFFPlugin,
                                         HDF5Plugin_V34 as HDF5Plugin)
 from ophyd import Component as Cpt, Signal
+from ophyd.status import AndStatus
 from pathlib import PurePath
 from bluesky.plan_stubs import stage, unstage, open_run, close_run, trigger_and_read, pause
 
@@ -38,12 +41,17 @@ class ProsilicaDetectorCamV33(ProsilicaDetectorCam):
 
     def ensure_nonblocking(self):
         self.stage_sigs['wait_for_plugins'] = 'Yes'
-        for c in self.parent.component_names:
-            cpt = getattr(self.parent, c)
-            if cpt is self:
-                continue
-            if hasattr(cpt, 'ensure_nonblocking'):
-                cpt.ensure_nonblocking()
+        # Resolving every component and probing it with hasattr() costs dozens
+        # of descriptor lookups per call; the component set is static, so do
+        # it once and cache the result on the parent.
+        siblings = getattr(self.parent, '_nonblocking_siblings', None)
+        if siblings is None:
+            siblings = [cpt for cpt in (getattr(self.parent, c)
+                                        for c in self.parent.component_names)
+                        if cpt is not self and hasattr(cpt, 'ensure_nonblocking')]
+            self.parent._nonblocking_siblings = siblings
+        for cpt in siblings:
+            cpt.ensure_nonblocking()
 
 
 class ProsilicaDetectorV33(ProsilicaDetector):
@@ -85,32 +93,139 @@ class HDF5PluginWithFileStoreProsilica(HDF5PluginWithFileStoreBase):
 
             See /home/xf08bm/bluesky-files/log/bluesky/bluesky.log for the full traceback.
         """
+        # If the plugin already reports a valid array size the IOC has not
+        # been restarted since the last priming, so cycling the camera again
+        # would only waste seconds at startup.
+        try:
+            _array_size = self.array_size.get()
+            already_primed = 0 not in (_array_size.height, _array_size.width)
+        except Exception:
+            already_primed = False
+        if already_primed:
+            return
+
         self.enable.set(1).wait()
-        sigs = OrderedDict([(self.parent.cam.array_callbacks, 1),
-                            (self.parent.cam.image_mode, 'Single'),
-                            (self.parent.cam.trigger_mode, 'Fixed Rate'),  # updated here "Internal" -> "Fixed Rate"
-                            # just in case tha acquisition time is set very long...
-                            (self.parent.cam.acquire_time, 1),
-                            (self.parent.cam.acquire_period, 1),
-                            (self.parent.cam.acquire, 1)])
+        # a plain list of pairs is all the ordered iteration we need here
+        sigs = [(self.parent.cam.array_callbacks, 1),
+                (self.parent.cam.image_mode, 'Single'),
+                (self.parent.cam.trigger_mode, 'Fixed Rate'),  # updated here "Internal" -> "Fixed Rate"
+                # just in case tha acquisition time is set very long...
+                (self.parent.cam.acquire_time, 1),
+                (self.parent.cam.acquire_period, 1)]
+
+        acquire = self.parent.cam.acquire
+
+        # Snapshot the current values concurrently; each .get() is a
+        # blocking CA read, so serially this costs one round-trip per signal.
+        snapshot_sigs = [sig for sig, _ in sigs] + [acquire]
+        with ThreadPoolExecutor(max_workers=len(snapshot_sigs)) as ex:
+            original_vals = list(
+                zip(snapshot_sigs, ex.map(lambda sig: sig.get(), snapshot_sigs))
+            )
+
+        # Apply the configuration signals concurrently and wait on the
+        # completion callbacks instead of sleeping between serial puts.
+        statuses = [sig.set(val, timeout=5) for sig, val in sigs]
+        for st in statuses:
+            st.wait(5)
+
+        # Start a single acquisition and wait for the IOC to report it done
+        # via a CA monitor rather than a blind 2 s sleep.
+        acquired = threading.Event()
+
+        def _acquire_done(value=None, old_value=None, **kwargs):
+            if old_value == 1 and value == 0:
+                acquired.set()
+
+        cid = acquire.subscribe(_acquire_done, run=False)
+        try:
+            acquire.set(1, timeout=5).wait(5)
+            acquired.wait(timeout=5)
+        finally:
+            acquire.unsubscribe(cid)
+
+        statuses = [sig.set(val, timeout=5)
+                    for sig, val in reversed(original_vals)]
+        for st in statuses:
+            st.wait(5)
+
+    def stage(self):
+        # one CA read at stage time instead of one per datum
+        self._cached_frames_per_point = (
+            1 if self.parent.is_flying else self.parent.cam.num_images.get(use_monitor=True)
+        )
+        return super().stage()
+
+    def unstage(self):
+        try:
+            return super().unstage()
+        finally:
+            self._cached_frames_per_point = None
 
-        original_vals = {sig: sig.get() for sig in sigs}
+    def get_frames_per_point(self):
+        fpp = getattr(self, "_cached_frames_per_point", None)
+        if fpp is None:  # not staged; fall back to a live read
+            fpp = 1 if self.parent.is_flying else self.parent.cam.num_images.get(use_monitor=True)
+        return fpp
 
-        for sig, val in sigs.items():
-            ttime.sleep(0.1)  # abundance of caution
-            sig.set(val).wait()
 
-        ttime.sleep(2)  # wait for acquisition
+class SingleTriggerParallelStageV33(SingleTriggerV33):
+    """SingleTriggerV33 that applies ``stage_sigs`` concurrently.
 
-        for sig, val in reversed(list(original_vals.items())):
-            ttime.sleep(0.1)
-            sig.set(val).wait()
+    The base class issues one blocking put per entry in ``stage_sigs``, so
+    staging costs N CA round-trips. Here all the puts are fired at once,
+    combined into a single status and waited on together, then the base
+    class is called with an empty ``stage_sigs`` to do the rest of the
+    staging bookkeeping (children, ``_original_vals`` driven unstage, etc.).
+    """
 
-    def get_frames_per_point(self):
-        if not self.parent.is_flying:
-            return self.parent.cam.num_images.get()
-        else:
-            return 1
+    def stage(self):
+        stage_sigs = OrderedDict(
+            (getattr(self, sig) if isinstance(sig, str) else sig, val)
+            for sig, val in self.stage_sigs.items()
+        )
+        original_vals = OrderedDict((sig, sig.get()) for sig in stage_sigs)
+
+        def _restore():
+            for sig, val in reversed(list(original_vals.items())):
+                sig.set(val).wait()
+
+        try:
+            # TriggerBase puts (acquire, 0) -- "If acquiring, stop" --
+            # ahead of the mode changes, and a live IOC can reject or
+            # wedge on mode puts while still acquiring, so keep the stop
+            # serial and parallelize only the order-insensitive rest
+            acquire = self.cam.acquire
+            if acquire in stage_sigs:
+                acquire.set(stage_sigs[acquire]).wait(10)
+            statuses = [
+                sig.set(val)
+                for sig, val in stage_sigs.items()
+                if sig is not acquire
+            ]
+            if statuses:
+                combined = statuses[0]
+                for st in statuses[1:]:
+                    combined = AndStatus(combined, st)
+                combined.wait(10)
+        except Exception:
+            # put things back the way we found them before re-raising
+            _restore()
+            raise
+
+        saved_stage_sigs = self.stage_sigs
+        self.stage_sigs = OrderedDict()
+        try:
+            ret = super().stage()
+        except Exception:
+            _restore()
+            raise
+        finally:
+            self.stage_sigs = saved_stage_sigs
+
+        # let unstage() restore the signals the usual way
+        self._original_vals.update(original_vals)
+        return ret
 
 
 class TIFFPluginEnsuredOff(TIFFPlugin):
@@ -120,7 +235,7 @@ class TIFFPluginEnsuredOff(TIFFPlugin):
         self.stage_sigs.update([('auto_save', 'No')])
 
 
-class StandardProsilica(SingleTriggerV33, ProsilicaDetectorV33):
+class StandardProsilica(SingleTriggerParallelStageV33, ProsilicaDetectorV33):
     image = Cpt(ImagePlugin, 'image1:')
     stats1 = Cpt(StatsPluginV33, 'Stats1:')
     stats2 = Cpt(StatsPluginV33, 'Stats2:')
@@ -136,23 +251,49 @@ class StandardProsilica(SingleTriggerV33, ProsilicaDetectorV33):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._is_flying = False
-
-    @property
-    def is_flying(self):
-        return self._is_flying
-
-    @is_flying.setter
-    def is_flying(self, is_flying):
-        self._is_flying = is_flying
+        # plain attribute; property dispatch is needless overhead on a bool
+        # that is checked per frame
+        self.is_flying = False
+        # direct references to the stats plugins and their totals, so hot
+        # paths and setup code skip the Cpt descriptor machinery on every
+        # camera.statsN.total traversal
+        self._stats_plugins = [getattr(self, f"stats{i}") for i in range(1, 6)]
+        self._stats_totals = [sp.total for sp in self._stats_plugins]
+
+        # defaults that used to live in the per-camera setup loop; each
+        # class sets up its own read_attrs/stage_sigs so instantiation code
+        # needs no hasattr/isinstance checks
+        self.read_attrs = [f"stats{i}" for i in range(1, 6)]
+        for stats_plugin in self._stats_plugins:
+            stats_plugin.read_attrs = ['total']
+        self._stats_totals[0].kind = 'hinted'
+        self._stats_totals[1].kind = 'hinted'
+
+        self.stage_sigs[self.cam.image_mode] = 'Multiple'
+        # 'Fixed Rate' is used for step scans; 'Sync In 2' for fly scans
+        self.stage_sigs[self.cam.trigger_mode] = 'Fixed Rate'
+        self.stage_sigs[self.cam.array_counter] = 0
 
 
 class CustomTIFFPluginWithFileStore(TIFFPluginWithFileStore):
+    def stage(self):
+        # one CA read at stage time instead of one per datum
+        self._cached_frames_per_point = (
+            1 if self.parent.is_flying else self.parent.cam.num_images.get(use_monitor=True)
+        )
+        return super().stage()
+
+    def unstage(self):
+        try:
+            return super().unstage()
+        finally:
+            self._cached_frames_per_point = None
+
     def get_frames_per_point(self):
-        if not self.parent.is_flying:
-            return self.parent.cam.num_images.get()
-        else:
-            return 1
+        fpp = getattr(self, "_cached_frames_per_point", None)
+        if fpp is None:  # not staged; fall back to a live read
+            fpp = 1 if self.parent.is_flying else self.parent.cam.num_images.get(use_monitor=True)
+        return fpp
 
 
 class StandardProsilicaWithTIFF(StandardProsilica):
@@ -161,6 +302,12 @@ class StandardProsilicaWithTIFF(StandardProsilica):
                write_path_template='/tmp',
                root='/nsls2/data/tes/legacy/detectors')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_attrs.append('tiff')
+        self.tiff.read_attrs = []  # leaving just the 'image'
+        self.stage_sigs[self.tiff.array_counter] = 0
+
 
 class StandardProsilicaWithHDF5(StandardProsilica):
     hdf5 = Cpt(HDF5PluginWithFileStoreProsilica,
@@ -168,6 +315,10 @@ class StandardProsilicaWithHDF5(StandardProsilica):
                write_path_template="/tmp",
                root='/nsls2/data/tes/legacy/detectors')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_attrs.append('hdf5')
+
 
 class WebcamWithHDF5(StandardProsilica):
     hdf5 = Cpt(HDF5PluginWithFileStoreBaseRGB,
@@ -175,97 +326,72 @@ class WebcamWithHDF5(StandardProsilica):
                write_path_template="/tmp",
                root='/nsls2/data/tes/legacy/detectors')
 
-
-# This camera is the default one (with the HDF5 plugin):
-'''
-cam6 = StandardProsilicaWithHDF5('XF:08BM-BI{Cam:6}', name='cam6')
-cam6.hdf5.write_path_template = "/nsls2/data/tes/legacy/detectors/cam6/hdf5/%Y/%m/%d/"
-cam6.cam.ensure_nonblocking()
-
-cam6_tiff = StandardProsilicaWithTIFF('XF:08BM-BI{Cam:6}', name='cam6_tiff')
-cam6_tiff.tiff.write_path_template = "/nsls2/data/tes/legacy/detectors/cam6/tiff/%Y/%m/%d/"
-cam6_tiff.cam.ensure_nonblocking()
-
-cam7 = StandardProsilicaWithHDF5('XF:08BM-BI{Cam:7}', name='cam7')
-cam7.hdf5.write_path_template = "/nsls2/data/tes/legacy/detectors/cam7/hdf5/%Y/%m/%d/"
-cam7.cam.ensure_nonblocking()
-
-cam7_tiff = StandardProsilicaWithTIFF('XF:08BM-BI{Cam:7}', name='cam7_tiff')
-cam7_tiff.tiff.write_path_template = "/nsls2/data/tes/legacy/detectors/cam7/tiff/%Y/%m/%d/"
-cam7_tiff.cam.ensure_nonblocking()
-
-# Webcams wrapped into ADURL IOC:
-es_webcam = WebcamWithHDF5("XF:08BM-BI{Axis-Cam:1}", name="es_webcam")
-es_webcam.hdf5.write_path_template = "/nsls2/data/tes/legacy/detectors/es_webcam/hdf5/%Y/%m/%d/"
-es_webcam.cam.ensure_nonblocking()
-
-vlm_webcam = WebcamWithHDF5("XF:08BM-ES{Axis-Cam:2}", name="vlm_webcam")
-vlm_webcam.hdf5.write_path_template = "/nsls2/data/tes/legacy/detectors/vlm_webcam/hdf5/%Y/%m/%d/"
-vlm_webcam.cam.ensure_nonblocking()
-
-for camera in [cam6, cam6_tiff, cam7, cam7_tiff, es_webcam, vlm_webcam]:
-    camera.read_attrs = ['stats1', 'stats2', 'stats3', 'stats4', 'stats5']
-    for plugin_type in ['hdf5', 'tiff']:
-        if hasattr(camera, plugin_type):
-            camera.read_attrs.append(plugin_type)
-
-    if hasattr(camera, 'tiff'):
-        camera.tiff.read_attrs = []  # leaving just the 'image'
-
-    for stats_name in ['stats1', 'stats2', 'stats3', 'stats4', 'stats5']:
-        stats_plugin = getattr(camera, stats_name)
-        stats_plugin.read_attrs = ['total']
-
-    camera.stage_sigs[camera.cam.image_mode] = 'Multiple'
-
-    # 'Sync In 2' is used for fly scans:
-    # camera.stage_sigs[camera.cam.trigger_mode] = 'Sync In 2'
-
-    # 'Fixed Rate' is used for step scans:
-    if not isinstance(camera, WebcamWithHDF5):
-        camera.stage_sigs[camera.cam.trigger_mode] = 'Fixed Rate'
-
-    camera.stage_sigs[camera.cam.array_counter] = 0
-    if hasattr(camera, 'tiff'):
-        camera.stage_sigs[camera.tiff.array_counter] = 0
-
-    camera.stats1.total.kind = 'hinted'
-    camera.stats2.total.kind = 'hinted'
-
-
-for cam in [cam6, cam7]:
-    cam.roi1.kind = "config"
-    cam.roi2.kind = "config"
-    cam.roi1.size.kind = "config"
-    cam.roi1.min_xyz.kind = "config"
-    cam.roi2.size.kind = "config"
-    cam.roi2.min_xyz.kind = "config"
-
-# Warm-up the hdf5 plugins:
-warmup_hdf5_plugins([cam6, cam7])
-
-sd.baseline.extend([cam6.roi1.size, cam6.roi1.min_xyz,
-                    cam6.roi2.size, cam6.roi2.min_xyz])
-
-'''
-import dask
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_attrs.append('hdf5')
+        # the ADURL-wrapped webcams do not have the Prosilica trigger modes
+        del self.stage_sigs[self.cam.trigger_mode]
+
+
+# The beamline cameras (cam6/cam7 Prosilicas and the ADURL-wrapped
+# webcams) are currently disabled. To re-enable one, instantiate its
+# class, point the plugin write_path_template at the detector's
+# directory and call cam.ensure_nonblocking(), e.g.:
+#
+#     cam6 = StandardProsilicaWithHDF5('XF:08BM-BI{Cam:6}', name='cam6')
+#     cam6.hdf5.write_path_template = "/nsls2/data/tes/legacy/detectors/cam6/hdf5/%Y/%m/%d/"
+#     cam6.cam.ensure_nonblocking()
+#     warmup_hdf5_plugins([cam6])
+#
+# read_attrs/stage_sigs defaults are applied by the classes themselves.
+import numpy as np
 from area_detector_handlers.handlers import AreaDetectorHDF5Handler, H5PY_KEYERROR_IOERROR_MSG
 
 
 class ADURLHDF5Handler(AreaDetectorHDF5Handler):
     """
     Modification of the Area Detector handler HDF5 for RGB data.
+
+    Returned frames are the RGB channels summed into uint16 (the maximum
+    possible value is 3 * 255, so uint16 is lossless). Consumers that need
+    floats should cast on their side rather than having every frame
+    produced 8x larger than necessary.
     """
+
+    # how many reduced entries to keep; one entry is fpp x H x W uint16
+    _PER_POINT_CACHE_SIZE = 32
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._per_point_cache = {}
+
     def __call__(self, point_number):
-        # Don't read out the dataset until it is requested for the first time.
-        if self._dataset is None:
-            try:
-                self._dataset = dask.array.from_array(self._file[self._key])
-                self._dataset = self._dataset.sum(axis=-1)
-            except KeyError as error:
-                raise IOError(H5PY_KEYERROR_IOERROR_MSG) from error
-
-        return super().__call__(point_number)
+        # Repeated requests for the same frame (e.g. re-plots) should not
+        # re-read and re-reduce; serve them from a small cache.
+        frame = self._per_point_cache.get(point_number)
+        if frame is not None:
+            return frame
+
+        # Read the requested frame_per_point slice -- the same
+        # (fpp, H, W) shape the base class returns -- and collapse the
+        # color axis directly. A dask graph buys nothing for per-point
+        # access and costs graph construction plus scheduler dispatch per
+        # call. uint16 is plenty for summed 8-bit RGB (max 3 * 255) and
+        # avoids the default int64 accumulator, which is 8x the memory
+        # traffic.
+        start = point_number * self._fpp
+        try:
+            frame = self._file[self._key][start : start + self._fpp].sum(
+                axis=-1, dtype=np.uint16
+            )
+        except KeyError as error:
+            raise IOError(H5PY_KEYERROR_IOERROR_MSG) from error
+
+        if len(self._per_point_cache) >= self._PER_POINT_CACHE_SIZE:
+            # drop the oldest entry to bound memory use
+            self._per_point_cache.pop(next(iter(self._per_point_cache)))
+        self._per_point_cache[point_number] = frame
+        return frame
 
 
 #db.reg.register_handler("AD_HDF5_RGB", ADURLHDF5Handler, overwrite=True)
@@ -1,17 +1,45 @@
 print(f"Loading {__file__!r} ...")
 
-from collections.abc import Sequence
-from itertools import zip_longest
 import datetime
+import functools
+import io
+import logging
 from pathlib import Path
 import pprint
 
 import numpy as np
-import toml
+
+try:
+    import tomllib  # stdlib, Python 3.11+
+except ModuleNotFoundError:
+    try:
+        import tomli as tomllib
+    except ModuleNotFoundError:
+        # last resort: the much slower pure-Python parser
+        import toml as tomllib
 
 import event_model
 import suitcase.utils
 
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_xdi_template(template_str):
+    """
+    Parse an XDI TOML template once per distinct template string.
+
+    A Serializer is constructed for every export, but repeated exports
+    almost always reuse the same template, so cache the parsed dict and
+    the column metadata derived from it.
+
+    Returns (template dict, columns tuple, export data keys tuple).
+    """
+    template = tomllib.loads(template_str)
+    columns = tuple(template["columns"].values())
+    export_data_keys = tuple({c["data_key"] for c in columns})
+    return template, columns, export_data_keys
+
 
 def export(
     gen,
@@ -149,7 +177,11 @@ class Serializer(event_model.DocumentRouter):
         if "xdi_file_template" not in kwargs or kwargs["xdi_file_template"] is None:
             raise Exception("xdi_file_template must contain configuration information in TOML format")
         else:
-           self._xdi_file_template = toml.loads(kwargs["xdi_file_template"])
+            (
+                self._xdi_file_template,
+                self.columns,
+                self.export_data_keys,
+            ) = _parse_xdi_template(kwargs["xdi_file_template"])
 
         if "transforms" not in kwargs or kwargs["transforms"] is None:
             self._transforms = dict()
@@ -161,12 +193,20 @@ class Serializer(event_model.DocumentRouter):
 
         self._uid_to_descriptor = dict()
 
+        # descriptor uid -> bound event_page handler, filled in descriptor()
+        self._descriptor_handlers = dict()
+
         # when writing files header information will be taken from self._header_line_buffer
         # and self._event_page_header_line_buffer. Header lines in the former will be the
         # same across all output files. Header lines in the latter will vary across output
         # files.
         self._header_line_buffer = dict()
 
+        # fully-rendered header text, cached once every header line is
+        # filled from start/descriptor documents; invalidated whenever a
+        # document fills in another line
+        self._static_header_text = None
+
         # use list self._row_end_docs to discriminate a "begin row" event_page from
         # an "end row" event page
         self._row_end_docs = list()
@@ -180,11 +220,54 @@ class Serializer(event_model.DocumentRouter):
         # is ready to write
         self._column_data = dict()
 
-        self.columns = tuple([v for k, v in self._xdi_file_template["columns"].items()])
         if len(self.columns) == 0:
             raise ValueError("found no Columns")
 
-        self.export_data_keys = tuple({c["data_key"] for c in self.columns})
+        # resolve each column's transform (or None) once, so the per-event
+        # loop in _update_data_columns_from_doc is a straight iteration
+        # instead of a dict membership test plus a transform lookup per
+        # column per event_page
+        self._column_plan = [
+            (c["data_key"], self._transforms.get(c.get("transform")))
+            for c in self.columns
+        ]
+
+        # the "# col1<TAB>col2..." line closing the header is the same for
+        # every output file, so render it once
+        self._column_label_line = (
+            "# " + "\t".join([c["column_label"] for c in self.columns]) + "\n"
+        )
+
+        # Bind the header template format methods once per Serializer.
+        # format_map(doc) also avoids the dict copy str.format(**doc) makes
+        # of the whole document on every call.
+        self._column_label_formats = {
+            label: template["column_label"].format_map
+            for label, template in self._xdi_file_template["columns"].items()
+        }
+        self._required_header_formats = {
+            label: template["data"].format_map
+            for label, template in self._xdi_file_template["required_headers"].items()
+        }
+        self._optional_header_formats = {
+            label: template["data"].format_map
+            for label, template in self._xdi_file_template["optional_headers"].items()
+        }
+
+        # The header line order is fixed here, once. The pending sets track
+        # which labels each section still needs, so header updates only
+        # visit unfilled labels instead of re-scanning whole template
+        # sections on every document.
+        self._header_sections = (
+            "versions", "columns", "required_headers", "optional_headers"
+        )
+        for section in self._header_sections:
+            for label in self._xdi_file_template[section]:
+                self._header_line_buffer[label] = None
+        self._pending_header_labels = {
+            section: set(self._xdi_file_template[section])
+            for section in self._header_sections
+        }
 
     @property
     def artifacts(self):
@@ -265,7 +348,7 @@ class Serializer(event_model.DocumentRouter):
             # Scan.edge_energy = Scan_edge_energy
         }
         """
-        print(f"start document")
+        logger.debug("start document")
         self._initialize_column_data_dict()
 
         # extract header information from the start document
@@ -289,6 +372,14 @@ class Serializer(event_model.DocumentRouter):
         """
         #print(f"descriptor document")
         self._uid_to_descriptor[doc["uid"]] = doc
+        # resolve which handler this descriptor's event_pages go to once,
+        # so event_page() is a single dict lookup per document instead of
+        # a descriptor lookup plus a chain of string compares
+        self._descriptor_handlers[doc["uid"]] = {
+            "row_ends": self._event_page_row_ends,
+            "energy_bins": self._event_page_energy_bins,
+            "primary": self._event_page_primary_dispatch,
+        }.get(doc["name"])
         self._update_header_lines_from_doc(
             doc_name="descriptor", doc=doc, header_line_buffer=self._header_line_buffer
         )
@@ -303,28 +394,27 @@ class Serializer(event_model.DocumentRouter):
             an event-page document
         """
         #print("event page document")
-        # get the stream name for this document from the corresponding descriptor document
-        stream_name = self._uid_to_descriptor[doc["descriptor"]]["name"]
-
-        if stream_name == "row_ends":
-            if len(self._row_end_docs) == 0:
-                self._row_end_docs.append(doc)
-                self._event_page_begin_row(doc)
-            elif len(self._row_end_docs) == 1:
-                self._event_page_end_row(doc)
-                self._row_end_docs.clear()
-            else:
-                # something is wrong
-                raise Exception(
-                    f"self._row_end_docs should not have length {len(self._row_end_docs)}"
-                )
-        elif stream_name == "energy_bins":
-            self._event_page_energy_bins(doc)
-        elif stream_name == "primary":
-            self._scan_number = doc["seq_num"]
-            self._event_page_primary(doc)
+        handler = self._descriptor_handlers.get(doc["descriptor"])
+        if handler is not None:
+            handler(doc)
+
+    def _event_page_row_ends(self, doc):
+        if len(self._row_end_docs) == 0:
+            self._row_end_docs.append(doc)
+            self._event_page_begin_row(doc)
+        elif len(self._row_end_docs) == 1:
+            self._event_page_end_row(doc)
+            self._row_end_docs.clear()
         else:
-            pass
+            # something is wrong
+            raise Exception(
+                f"self._row_end_docs should not have length {len(self._row_end_docs)}"
+            )
+
+    def _event_page_primary_dispatch(self, doc):
+        # use seq_num from the primary stream to determine the scan number
+        self._scan_number = doc["seq_num"]
+        self._event_page_primary(doc)
 
     def _event_page_begin_row(self, doc):
         """
@@ -366,36 +456,80 @@ class Serializer(event_model.DocumentRouter):
 
         """
         self._update_data_columns_from_doc(doc=doc)
+        # one strftime call instead of building a second datetime.time
+        # object just to isoformat it
         now = datetime.datetime.now()
 
-        print(self._templated_file_prefix)
+        logger.debug("%s", self._templated_file_prefix)
         filename = (
-            self._templated_file_prefix
-            + str(self._scan_number[0])
-            + "-"
-            + datetime.time(
-                hour=now.hour,
-                minute=now.minute,
-                second=now.second
-            ).isoformat()
-            + ".xdi"
+            f"{self._templated_file_prefix}"
+            f"{self._scan_number[0]}-{now.strftime('%H:%M:%S')}.xdi"
         )
-        with self._manager.open("stream_data", filename, "xt") as xdi_file:
-            # combine header line buffers maintaining header line order
-            combined_header_line_buffer = dict(self._header_line_buffer)
-            for k, v in self._event_page_header_line_buffer.items():
-                if combined_header_line_buffer[k] is None:
-                    combined_header_line_buffer[k] = v
-
-            self._write_header(
-                output_file=xdi_file, header_line_buffer=combined_header_line_buffer
+        # Assemble the whole file -- header and body -- in an in-memory
+        # buffer so the managed file sees exactly one write() call instead
+        # of one per header line.
+        buf = io.StringIO()
+
+        # When every header line was already filled from the
+        # start/descriptor documents nothing varies per file, so the
+        # header is rendered once and the same string reused for every
+        # output file of the scan.
+        if self._static_header_text is None and not any(
+            v is None for v in self._header_line_buffer.values()
+        ):
+            self._static_header_text = (
+                "\n".join(self._header_line_buffer.values()) + "\n"
             )
-            # self._column_data_values looks like
-            # [[...], [...], [...]]
-            # pprint(self._column_data)
-            for row_data in zip_longest(*self._column_data.values(), fillvalue="NA"):
-                xdi_file.write("\t".join((str(d) for d in row_data)))
-                xdi_file.write("\n")
+
+        if self._static_header_text is not None:
+            buf.write(self._static_header_text)
+            self._write_header_tail(buf)
+        else:
+            # write the shared header lines in template order, substituting
+            # this file's per-file lines (start/end times) for the unfilled
+            # ones -- no merged dict copy per output file
+            per_file_lines = self._event_page_header_line_buffer
+            for k, v in self._header_line_buffer.items():
+                if v is None:
+                    v = per_file_lines.get(k)
+                buf.write(v)
+                buf.write("\n")
+            self._write_header_tail(buf)
+        # self._column_data_values looks like
+        # [[...], [...], [...]]
+        # pprint(self._column_data)
+        # Convert each column to text in one vectorized pass --
+        # astype(str) produces the same digits str() would, but in
+        # numpy's C loop -- then assemble the body in a single
+        # preallocated (rows, columns) buffer; short columns keep the
+        # "NA" fill. One join builds the whole body string.
+        cols = []
+        for v in self._column_data.values():
+            col = np.atleast_1d(np.asarray(v))
+            if col.dtype.kind != "U":
+                col = col.astype(str)
+            cols.append(col)
+        n_rows = max(col.shape[0] for col in cols)
+        col_buf = np.full((n_rows, len(cols)), "NA", dtype=object)
+        for col_idx, col in enumerate(cols):
+            col_buf[: col.shape[0], col_idx] = col
+        # str.join is slightly faster fed a list than a generator
+        body = "\n".join(["\t".join(row) for row in col_buf])
+        buf.write(body)
+        buf.write("\n")
+
+        # Ask the manager for an untranslated ascii file when it supports
+        # the extra open() keywords (plain MultiFileManager takes encoding
+        # but not newline); with the whole file delivered in one write()
+        # the default buffer size no longer matters.
+        try:
+            xdi_file = self._manager.open(
+                "stream_data", filename, "xt", encoding="ascii", newline="\n"
+            )
+        except TypeError:
+            xdi_file = self._manager.open("stream_data", filename, "xt")
+        with xdi_file:
+            xdi_file.write(buf.getvalue())
 
     def _update_data_columns_from_doc(self, doc):
         # keep a dict of columns of data like:
@@ -404,27 +538,23 @@ class Serializer(event_model.DocumentRouter):
         #    "I0"     : None
         #    "If"     : array...
         #  }
-        for column in self.columns:
-            data_key = column["data_key"]
+        for data_key, transform_function in self._column_plan:
             # expect to find an array for the data_key
             if data_key in doc["data"]:
                 # if self._column_data[data_key] is None and data_key in doc["data"]:
                 # print(f"getting {data_key} from doc {doc['descriptor']}")
-                if "transform" in column.keys():
+                if transform_function is not None:
                     # print("*************** applying a transform!")
-                    transform_key = column["transform"]
-                    transform_function = self._transforms[transform_key]
                     self._column_data[data_key] = transform_function(doc)
                 else:
                     event_data = doc["data"][data_key][0]  # TODO: why is [0] needed?
                     # (f"found data for data key {data_key}")
                     # pprint(event_data)
-                    if isinstance(event_data, np.ndarray):
-                        self._column_data[data_key] = event_data
-                    elif isinstance(event_data, Sequence):
-                        self._column_data[data_key] = event_data
-                    else:
-                        self._column_data[data_key] = (event_data,)
+                    # asarray is a no-op on ndarrays and converts sequences
+                    # in C, replacing the old isinstance chain; 0-d means a
+                    # scalar, kept as a 1-tuple as before
+                    arr = np.asarray(event_data)
+                    self._column_data[data_key] = arr if arr.ndim else (event_data,)
 
     def stop(self, doc):
         pass
@@ -480,14 +610,17 @@ class Serializer(event_model.DocumentRouter):
                 or
                     ("Element.symbol", "# Element.symbol = K")
         """
+        # this document may fill in more lines, so the cached rendering
+        # (if any) is stale
+        self._static_header_text = None
 
         def _get_empty_header_lines(config_section_name):
             """
             Return entries from self._xdi_file_template to be used to generate header rows
-            using information from a document. Each (key, value) pair returned meets
-            two criteria:
-              1. 'key' is in both self._xdi_file_template and header_line_buffer
-              2. header_line_buffer[key] is None (meaning this header row has not been generated yet)
+            using information from a document. Only labels whose header row
+            has not been generated yet (tracked in
+            self._pending_header_labels) are returned, so each call is
+            O(unfilled labels) rather than a scan of the whole section.
 
             Parameters
             ----------
@@ -497,30 +630,20 @@ class Serializer(event_model.DocumentRouter):
 
             Return
             ------
-            list of (key, value) entries from self._xdi_file_template meeting the criteria specified above
+            (key, value) entries from self._xdi_file_template whose header row is still pending
             """
-            for _header_label in self._xdi_file_template[config_section_name].keys():
-                # initialize self._header_line_buffer[k] if it does not exist
-                if _header_label not in header_line_buffer:
-                    header_line_buffer[_header_label] = None
-                else:
-                    # _header_label is already a key in header_line_buffer
-                    pass
-                # if the corresponding header line has not been generated
-                # yield the string template to generate that line
-                if header_line_buffer[_header_label] is None:
-                    yield _header_label, self._xdi_file_template[config_section_name][
-                        _header_label
-                    ]
-                else:
-                    # a header line string has already been generated for _header_label
-                    pass
+            section = self._xdi_file_template[config_section_name]
+            # iterate over a snapshot so the caller can discard labels as
+            # it fills them in
+            for _header_label in tuple(self._pending_header_labels[config_section_name]):
+                yield _header_label, section[_header_label]
 
         for header_label, version in _get_empty_header_lines("versions"):
             header_line_buffer[header_label] = version
+            self._pending_header_labels["versions"].discard(header_label)
 
         for header_label, column_line_template in _get_empty_header_lines("columns"):
-            header_value = column_line_template["column_label"].format(**doc)
+            header_value = self._column_label_formats[header_label](doc)
             if "units" in column_line_template:
                 header_line_buffer[header_label] = (
                     f"# {header_label} = {header_value} "
@@ -528,6 +651,7 @@ class Serializer(event_model.DocumentRouter):
                 )
             else:
                 header_line_buffer[header_label] = f"# {header_label} = {header_value}"
+            self._pending_header_labels["columns"].discard(header_label)
 
         for header_label, column_line_template in _get_empty_header_lines(
             "required_headers"
@@ -538,14 +662,16 @@ class Serializer(event_model.DocumentRouter):
                 and doc_name == column_line_template["doc_name"]
             )
             if doc_name_unconstrained or doc_name_constraint_satisfied:
-                header_value = column_line_template["data"].format(**doc)
+                header_value = self._required_header_formats[header_label](doc)
                 header_line_buffer[header_label] = f"# {header_label} = {header_value}"
+                self._pending_header_labels["required_headers"].discard(header_label)
 
         for header_label, column_line_template in _get_empty_header_lines(
             "optional_headers"
         ):
-            header_value = column_line_template["data"].format(**doc)
+            header_value = self._optional_header_formats[header_label](doc)
             header_line_buffer[header_label] = f"{header_label} = {header_value}"
+            self._pending_header_labels["optional_headers"].discard(header_label)
 
     def _write_header(self, header_line_buffer, output_file):
         """Write all header information, "None" for missing information.
@@ -555,7 +681,8 @@ class Serializer(event_model.DocumentRouter):
             output_file.write(header_value)
             output_file.write("\n")
 
+        self._write_header_tail(output_file)
+
+    def _write_header_tail(self, output_file):
         output_file.write("#----\n")
-        output_file.write(
-            "# {}\n".format("\t".join([c["column_label"] for c in self.columns]))
-        )
+        output_file.write(self._column_label_line)
@@ -1,13 +1,23 @@
 print(f"Loading {__file__!r} ...")
 
+import collections
 import datetime
+import functools
+import math
 import os.path
+import time
 import pprint
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+try:
+    import numba
+except ImportError:
+    # numba is optional; the plain numpy versions below work without it
+    numba = None
+
 from ophyd.status import WaitTimeoutError
 from ophyd.utils import LimitError
 from ophyd import Signal
@@ -29,12 +39,14 @@ def _validate_motor_limits(motor, start, stop, k):
     assert start < stop, (
         f"start ({start}) must be smaller than " f"stop ({stop}) for {k}"
     )
-    limits = motor.limits
-    if any(not (limits[0] < v < limits[1]) for v in (start, stop)):
+    lo, hi = motor.limits
+    # start < stop already holds, so two compares cover both values --
+    # no tuple, generator frame, or any() dispatch
+    if start <= lo or stop >= hi:
         raise LimitError(
             f"your requested {k} values are out of limits for "
             "the motor "
-            f"{limits[0]} < ({start}, {stop}) < {limits[1]}"
+            f"{lo} < ({start}, {stop}) < {hi}"
         )
 
 
@@ -43,12 +55,226 @@ def _get_v_with_dflt(sig, dflt):
     return ret[sig.name]["value"] if ret is not None else dflt
 
 
+# Cache for quasi-static beamline parameters (motor resolutions, mono
+# calibration), keyed by signal name. XANES_mapping calls xy_fly once per
+# energy point and each call would otherwise re-read the same mres PVs
+# over CA; the cache amortizes that to one read per stack. It is cleared
+# at the start of each stack, and by any xy_fly call whose caller did not
+# forward fresh values, so a recalibration in a long bsui session is
+# picked up.
+_RES_CACHE = {}
+
+
+def _get_v_cached(sig, dflt):
+    name = sig.name
+    if name not in _RES_CACHE:
+        _RES_CACHE[name] = yield from _get_v_with_dflt(sig, dflt)
+    return _RES_CACHE[name]
+
+
+def _wait_hdf5_flushed(dev, timeout=30, poll_period=0.25):
+    """Wait until dev's HDF5 plugin has captured every requested frame.
+
+    Replaces the fixed 15 s "waiting for files" sleep before export:
+    returns as soon as num_captured reaches num_capture (plus a short
+    settle for the writer to close out), or after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if dev.hdf5.num_captured.get() >= dev.hdf5.num_capture.get():
+            # small safety margin for the writer to flush and close
+            yield from bps.sleep(1)
+            return
+        yield from bps.sleep(poll_period)
+    print(f"{dev.name} HDF5 file did not finish within {timeout} s; continuing")
+
+
+def _dtt_program(seq, settle):
+    """Send a command sequence to the delta-tau and settle once.
+
+    bps.mv waits for each put to complete, so the commands still arrive
+    in order; the single trailing sleep replaces the per-command sleeps
+    that used to add up to over half a second per scan (and per row).
+    """
+    for v in seq:
+        yield from bps.mv(dtt, v)
+    yield from bps.sleep(settle)
+
+
+def _wait_armed(fallback_sleep, *, xspress3=None, timeout=2.0, poll_period=0.05):
+    """Wait for the scaler (and xspress3, if given) to report acquiring.
+
+    The fly plans used to sleep a fixed arm delay after triggering; over
+    a many-row map that is minutes of pure idle. Poll the ready signals
+    instead and fall back to the old fixed ``fallback_sleep`` only if the
+    devices do not report armed within ``timeout`` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        armed = str(sclr.mcas.status.get()) in ("Acquiring", "1")
+        if armed and xspress3 is not None:
+            armed = xspress3.cam.acquire.get() == 1
+        if armed:
+            return
+        yield from bps.sleep(poll_period)
+    # never reported armed -- preserve the old fixed delay
+    yield from bps.sleep(fallback_sleep)
+
+
+# Mono geometry conversions, shared by E_fly and XANES_mapping. These
+# take e_back / energy_cal as arguments (instead of closing over them per
+# scan) and expect ndarray input, so numba can compile them when it is
+# available; the fused loop then runs without the intermediate arrays the
+# ufunc chain allocates.
+def _linear_to_energy(linear, e_back, energy_cal):
+    return e_back / np.sin(
+        np.deg2rad(45)
+        + 0.5 * np.arctan((28.2474 - linear) / 35.02333)
+        + np.deg2rad(energy_cal) / 2
+    )
+
+
+def _energy_to_linear(energy, e_back, energy_cal):
+    return 28.2474 + 35.02333 * np.tan(
+        np.pi / 2 - 2 * np.arcsin(e_back / energy) + np.deg2rad(energy_cal)
+    )
+
+
+def _energy_to_linear_scalar(energy, e_back, energy_cal):
+    # scalar twin of _energy_to_linear for one-energy-at-a-time callers
+    # (XANES_mapping): math-module calls skip the ufunc dispatch and the
+    # 1-element array round trip
+    return 28.2474 + 35.02333 * math.tan(
+        math.pi / 2 - 2 * math.asin(e_back / energy) + math.radians(energy_cal)
+    )
+
+
+def _compute_bin_centers(l_start, a_l_step_size, num_pixels, e_back, energy_cal):
+    """Energy bin centers for a linear fly from l_start in num_pixels steps."""
+    bin_edges = _linear_to_energy(
+        l_start + a_l_step_size * np.arange(num_pixels + 1), e_back, energy_cal
+    )
+    return (bin_edges[:-1] + bin_edges[1:]) / 2
+
+
+if numba is not None:
+    _linear_to_energy = numba.njit(cache=True, fastmath=True)(_linear_to_energy)
+    _energy_to_linear = numba.njit(cache=True, fastmath=True)(_energy_to_linear)
+
+    @numba.njit(cache=True, fastmath=True)
+    def _compute_bin_centers(l_start, a_l_step_size, num_pixels, e_back, energy_cal):
+        # fused edges->centers: each edge energy is computed once and
+        # reused as the next bin's leading edge, with no temporaries
+        out = np.empty(num_pixels)
+        e1 = _linear_to_energy(l_start, e_back, energy_cal)
+        for i in range(num_pixels):
+            e2 = _linear_to_energy(
+                l_start + (i + 1) * a_l_step_size, e_back, energy_cal
+            )
+            out[i] = 0.5 * (e1 + e2)
+            e1 = e2
+        return out
+
+    # compile at profile load so the first scan does not pay for it
+    # (cache=True makes this a disk-cache hit on subsequent startups)
+    _linear_to_energy(np.array([20.0]), 1977.04, 0.40118)
+    _energy_to_linear(np.array([2000.0]), 1977.04, 0.40118)
+    _compute_bin_centers(20.0, 0.001, 4, 1977.04, 0.40118)
+
+
+_XYGeometry = collections.namedtuple(
+    "_XYGeometry",
+    "prescale a_xstep_size a_ystep_size num_xpixels num_ypixels x_centers",
+)
+
+
+@functools.lru_cache(maxsize=16)
+def _xy_geometry(xstart, xstop, xstep_size, ystart, ystop, ystep_size, xmres, ymres):
+    """Derived xy_fly scan geometry, memoized on the user inputs.
+
+    XANES_mapping reruns xy_fly with the same geometry at every energy
+    point; the repeat calls reuse this bundle instead of redoing the
+    math and reallocating x_centers. The cached centers array is
+    read-only so one scan cannot corrupt the next.
+    """
+    # to reach 0.4um step size
+    # (math.floor of the true quotient, not //: float floor-division
+    # computes floor((a - a mod b) / b) and lands one short of
+    # floor(a / b) at exact multiples like 0.001 / 0.0002)
+    prescale = math.floor(xstep_size / (5 * xmres))
+    #prescale = math.floor(xstep_size / (2 * xmres))
+    a_xstep_size = prescale * (5 * xmres)
+    #a_xstep_size = xstep_size;
+    a_ystep_size = math.floor(ystep_size / ymres) * ymres
+
+    num_xpixels = math.floor((xstop - xstart) / a_xstep_size)
+    num_ypixels = math.floor((ystop - ystart) / a_ystep_size)
+
+    # single linspace writes the centers in one pass instead of the
+    # arange/multiply/add chain and its temporaries
+    first_x_center = xstart + a_xstep_size / 2
+    x_centers_arr = np.linspace(
+        first_x_center,
+        first_x_center + a_xstep_size * (num_xpixels - 1),
+        num_xpixels,
+    )
+    x_centers_arr.setflags(write=False)
+    return _XYGeometry(
+        prescale, a_xstep_size, a_ystep_size, num_xpixels, num_ypixels, x_centers_arr
+    )
+
+
+def _roi_sum(d, lo, hi):
+    """Sum the fluorescence ROI window (last axis) of a 4-D stack."""
+    return np.sum(d[:, :, :, lo:hi], axis=-1)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _roi_sum(d, lo, hi):
+        # the reduction is independent per spectrum, so spread the scans
+        # across threads; for the wide fluor arrays this is bandwidth-
+        # bound and parallel threads drain memory faster than one
+        # numpy reduction
+        N, X, C = d.shape[0], d.shape[1], d.shape[2]
+        out = np.empty((N, X, C), dtype=np.float64)
+        for i in numba.prange(N):
+            for x in range(X):
+                for c in range(C):
+                    s = 0.0
+                    for k in range(lo, hi):
+                        s += d[i, x, c, k]
+                    out[i, x, c] = s
+        return out
+
+    _roi_sum(np.zeros((1, 1, 1, 2)), 0, 1)
+
+
+@functools.lru_cache(maxsize=16)
+def _compute_bin_centers_cached(l_start, a_l_step_size, num_pixels, e_back, energy_cal):
+    """Memoized _compute_bin_centers for repeated identical geometries.
+
+    XANES stacks rerun E_fly with the same geometry; the repeat calls
+    skip the transcendental math and the allocation entirely. The cached
+    array is marked read-only so one scan cannot corrupt the next.
+    """
+    bin_centers = _compute_bin_centers(
+        l_start, a_l_step_size, num_pixels, e_back, energy_cal
+    )
+    bin_centers.setflags(write=False)
+    return bin_centers
+
+
 x_centers = Signal(value=[], name="x_centers", kind="normal")
 x_centers.tolerance = 1e-15
 y_centers = Signal(value=[], name="y_centers", kind="normal")
 y_centers.tolerance = 1e-15
 z_centers = Signal(value=[], name="z_centers", kind="normal")
 z_centers.tolerance = 1e-15
+# per-row (x, y) start positions for xy_fly, emitted as one "row_ends"
+# event at the end of the scan instead of one document round-trip per row
+row_ends_positions = Signal(value=[], name="row_ends_positions", kind="normal")
+row_ends_positions.tolerance = 1e-15
 
 #sys.stdout = keyw
 
@@ -65,6 +291,8 @@ def xy_fly(
         ystep_size=None,
         xspress3=xs,
         plot=True,
+        _xmres=None,
+        _ymres=None,
 ):
     """Do a x-y fly scan.
 
@@ -95,6 +323,11 @@ def xy_fly(
 
     scan_title : str
        Title of scan, required.
+
+    _xmres, _ymres : float, optional
+       Pre-read x/y motor resolutions in mm. Callers that run xy_fly in
+       a loop (XANES_mapping) read them once and pass them in to skip
+       the per-call CA reads.
     """
     xspress3 = xs
     if not isinstance(xspress3, TESXspress3Detector1CH):
@@ -108,25 +341,31 @@ def xy_fly(
     assert dwell_time > 0, f"dwell_time ({dwell_time}) must be more than 0"
     assert xstep_size > 0, f"xstep_size ({xstep_size}) must be more than 0"
     assert ystep_size > 0, f"ystep_size ({ystep_size}) must be more than 0"
-    ret = yield from bps.read(xy_fly_stage.x.mres)  # (in mm)
-    #xmres = ret[xy_fly_stage.x.mres.name]["value"] if ret is not None else 0.0003125
-    xmres = ret[xy_fly_stage.x.mres.name]["value"] if ret is not None else 0.0002
-    ret = yield from bps.read(xy_fly_stage.y.mres)  # (in mm)
-    ymres = ret[xy_fly_stage.y.mres.name]["value"] if ret is not None else 0.0002
-
-    # to reach 0.4um step size
-    prescale = int(np.floor((xstep_size / (5 * xmres))))
-    #prescale = int(np.floor((xstep_size / (2*xmres))))
-    a_xstep_size = prescale * (5*xmres)
-    #a_xstep_size = xstep_size;
-    a_ystep_size = int(np.floor((ystep_size / (ymres)))) * ymres
-
-    num_xpixels = int(np.floor((xstop - xstart) / a_xstep_size))
-    num_ypixels = int(np.floor((ystop - ystart) / a_ystep_size))
+    if _xmres is None or _ymres is None:
+        # standalone call (nothing forwarded): do not trust values read
+        # arbitrarily long ago in this session -- fetch them fresh
+        _RES_CACHE.clear()
+    #xmres dflt used to be 0.0003125
+    if _xmres is not None:
+        xmres = _xmres
+    else:
+        xmres = yield from _get_v_cached(xy_fly_stage.x.mres, 0.0002)  # (in mm)
+    if _ymres is not None:
+        ymres = _ymres
+    else:
+        ymres = yield from _get_v_cached(xy_fly_stage.y.mres, 0.0002)  # (in mm)
 
-    yield from bps.mv(
-        x_centers, a_xstep_size / 2 + xstart + np.arange(num_xpixels) * a_xstep_size
+    geom = _xy_geometry(
+        xstart, xstop, xstep_size, ystart, ystop, ystep_size,
+        float(xmres), float(ymres),
     )
+    prescale = geom.prescale
+    a_xstep_size = geom.a_xstep_size
+    a_ystep_size = geom.a_ystep_size
+    num_xpixels = geom.num_xpixels
+    num_ypixels = geom.num_ypixels
+
+    yield from bps.mv(x_centers, geom.x_centers)
 
     # SRX original roi_key = getattr(xs.channel1.rois, roi_name).value.name
 
@@ -160,10 +399,10 @@ def xy_fly(
         ) from e
 
     # set up delta-tau trigger to fast motor
-    for v in ["p1600=0", "p1607=1", "p1601=5", "p1602 = 2", "p1604 = 0", "p1600=1"]:
-    #for v in ["p1600=0", "p1607=1", "p1601=2", "p1602 = 1", "p1604 = 0", "p1600=1"]:
-        yield from bps.mv(dtt, v)
-        yield from bps.sleep(0.2)
+    #["p1600=0", "p1607=1", "p1601=2", "p1602 = 1", "p1604 = 0", "p1600=1"]
+    yield from _dtt_program(
+        ["p1600=0", "p1607=1", "p1601=5", "p1602 = 2", "p1604 = 0", "p1600=1"], 0.2
+    )
 
 
     if plot and xspress3:
@@ -220,9 +459,8 @@ def xy_fly(
 
     # TODO make this a message?
     sclr.set_mode("flying")
-    # poke the struck settings
-    yield from bps.mv(sclr.mcas.prescale, prescale)
-    yield from bps.mv(sclr.mcas.nuse, num_xpixels)
+    # poke the struck settings (one mv so the puts go out together)
+    yield from bps.mv(sclr.mcas.prescale, prescale, sclr.mcas.nuse, num_xpixels)
     if xspress3 is not None:
         # jlynch:
         # could use hdf5.num_capture in generate_datum() to set
@@ -232,9 +470,13 @@ def xy_fly(
         # TODO: why are num_xpixels+1 being acquired? should be num_xpixels
         xspress3.fluor.shape = (num_xpixels, 2, 4096)
         xspress3.fluor.dims = ("num_xpixels", "channels", "bin_count")
-        yield from bps.mv(xspress3.external_trig, True)
-        yield from bps.mv(xspress3.total_points, num_xpixels)
-        yield from bps.mv(xspress3.cam.num_images, num_xpixels)
+        # one mv: the puts are issued concurrently and the plan waits on
+        # the slowest instead of paying each round trip in turn
+        yield from bps.mv(
+            xspress3.external_trig, True,
+            xspress3.total_points, num_xpixels,
+            xspress3.cam.num_images, num_xpixels,
+        )
 
 
 
@@ -274,12 +516,20 @@ def xy_fly(
         }
     )
     def fly_body():
+        # one block allocation for every row's y_centers values; each row
+        # fills and emits its own view, so documents already emitted never
+        # alias a buffer that later rows mutate
+        _y_block = np.empty((num_ypixels, num_xpixels))
+        # accumulates each row's (x, y) start position, see row_ends emit
+        # at the bottom
+        _row_ends_buf = np.empty((num_ypixels, 2))
+        # every row's slow-axis target, computed in one pass up front
+        target_ys = ystart + a_ystep_size * np.arange(num_ypixels, dtype=np.float64)
+
         yield from bps.mv(xy_fly_stage.x, xstart, xy_fly_stage.y, ystart)
 
         #  This part is not necessary to be here. revised by YDu
-        for v in ["p1600=0", "p1600=1"]:
-            yield from bps.mv(dtt, v)
-            yield from bps.sleep(0.2)
+        yield from _dtt_program(["p1600=0", "p1600=1"], 0.2)
 
         # Set TimeSeries to collect correct number of points
         if xspress3:
@@ -288,7 +538,7 @@ def xy_fly(
         #n_current_row = 0
 
         @bpp.stage_decorator([x for x in [xspress3] if x is not None])
-        def fly_row():
+        def fly_row(y, target_y):
 
             ## Artificially make the scan to stall at the end of row #2 (for debugging !!!)
             #nonlocal n_current_row  #################
@@ -303,12 +553,11 @@ def xy_fly(
             
             # go to start of row
             yield from bps.mv(xy_fly_stage.x.velocity, 5.0)
-            target_y = ystart + y * a_ystep_size
             yield from bps.checkpoint()
             yield from bps.mv(xy_fly_stage.x, xstart, xy_fly_stage.y, target_y)
-            yield from bps.abs_set(
-                y_centers, np.ones(num_xpixels) * target_y
-            )  # set the fly speed
+            row_y = _y_block[y]
+            row_y.fill(target_y)
+            yield from bps.abs_set(y_centers, row_y)  # set the fly speed
 
 
 
@@ -324,8 +573,10 @@ def xy_fly(
 
             yield from bps.mv(xy_fly_stage.x.velocity, flyspeed)
             yield from bps.sleep(0.2)
-            yield from bps.trigger_and_read([xy_fly_stage], name="row_ends")
-            yield from bps.sleep(0.2)
+            # record the row start position; the whole table is emitted as
+            # a single row_ends event when fly_body finishes, instead of a
+            # full descriptor/event round trip per row
+            _row_ends_buf[y] = (xstart, target_y)
 
 
             # arm the struck
@@ -347,7 +598,8 @@ def xy_fly(
             #  revised by YDu, use to be 1.5
             #print(f"After trigger: {time.time()}")
 
-            yield from bps.sleep(2)            # fly the motor
+            yield from _wait_armed(2, xspress3=xspress3)
+            # fly the motor
             yield from bps.abs_set(
                  xy_fly_stage.x, xstop + a_xstep_size, group=f"fly_row_{y}"
         #        xy_fly_stage.x, xstop + a_xstep_size, group = f"motor_{y}"
@@ -412,7 +664,10 @@ def xy_fly(
                     print('Timeout on starting time-series! Continuing...')
                     print(e)
 
-            yield from fly_row()
+            yield from fly_row(y, target_ys[y])
+
+        yield from bps.mv(row_ends_positions, _row_ends_buf)
+        yield from bps.trigger_and_read([row_ends_positions], name="row_ends")
 
     yield from fly_body()
     yield from bps.mv(xy_fly_stage.x.velocity, 5.0)
@@ -444,36 +699,31 @@ def E_fly(
 #    yield from bps.mv(xs.channel1.rois.roi01.bin_high, roi[1])
 #    yield from bps.sleep(0.5)
 
-    def _linear_to_energy(linear):
-        linear = np.asarray(linear)
-        return e_back / np.sin(
-            np.deg2rad(45)
-            + 0.5 * np.arctan((28.2474 - linear) / 35.02333)
-            + np.deg2rad(energy_cal) / 2
-        )
-
-    def _energy_to_linear(energy):
-        energy = np.asarray(energy)
-        return 28.2474 + 35.02333 * np.tan(
-            np.pi / 2 - 2 * np.arcsin(e_back / energy) + np.deg2rad(energy_cal)
-        )
-
     # get limits in linear parameters
-    l_start, l_stop = _energy_to_linear([start, stop])
-    l_step_size = np.diff(_energy_to_linear([start, start + step_size]))
+    l_start, l_stop = _energy_to_linear(
+        np.array([start, stop], dtype=np.float64), e_back, energy_cal
+    )
+    l_step_size = np.diff(
+        _energy_to_linear(
+            np.array([start, start + step_size], dtype=np.float64),
+            e_back,
+            energy_cal,
+        )
+    )
 
     # scale to match motor resolution
     lmres = yield from _get_v_with_dflt(mono.linear.mres, 0.0001666)
 
-    prescale = int(np.floor((l_step_size / (5 * lmres))))
+    prescale = math.floor(l_step_size[0] / (5 * lmres))
     a_l_step_size = prescale * (5 * lmres)
 
-    num_pixels = int(np.floor((l_stop - l_start) / a_l_step_size))
+    num_pixels = math.floor((l_stop - l_start) / a_l_step_size)
     print(f"l_start={l_start} l_stop={l_stop} a_l_step_size={a_l_step_size}")
     print(f"=========== num_pixels={num_pixels} ==============")
 
-    bin_edges = _linear_to_energy(l_start + a_l_step_size * np.arange(num_pixels + 1))
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    bin_centers = _compute_bin_centers_cached(
+        float(l_start), float(a_l_step_size), num_pixels, e_back, energy_cal
+    )
 
     yield from bps.mv(E_centers, bin_centers)
 
@@ -481,9 +731,9 @@ def E_fly(
     # flyspeed = 0.05
 
     # set up delta-tau trigger to fast motor
-    for v in ["p1600=0", "p1607=4", "p1601=5", "p1602 = 2", "p1604 = 0", "p1600=1"]:
-        yield from bps.mv(dtt, v)
-        yield from bps.sleep(0.1)
+    yield from _dtt_program(
+        ["p1600=0", "p1607=4", "p1601=5", "p1602 = 2", "p1604 = 0", "p1600=1"], 0.1
+    )
 
     # TODO make this a message?
     sclr.set_mode("flying")
@@ -493,19 +743,20 @@ def E_fly(
     # roi_livegrid_key = xs.channel1.rois.roi01.value.name
     # roi_livegrid = LivePlot(y=roi_livegrid_key)
 
-    # poke the struck settings
-    yield from bps.mv(sclr.mcas.prescale, prescale)
-    yield from bps.mv(sclr.mcas.nuse, num_pixels)
+    # poke the struck settings (one mv so the puts go out together)
+    yield from bps.mv(sclr.mcas.prescale, prescale, sclr.mcas.nuse, num_pixels)
 
     if xspress3 is not None:
         xspress3.fluor.shape = (num_pixels, 2, 4096)
         xspress3.fluor.dims = ("num_pixels", "channels", "bin_count")
-        yield from bps.mv(xspress3.external_trig, True)
-        #yield from mv(xspress3.total_points, num_pixels)
-        yield from bps.mv(xspress3.hdf5.num_capture, num_pixels)
-        #yield from mv(xspress3.settings.num_images, num_pixels)
-        yield from bps.mv(xspress3.total_points, num_pixels)
-        yield from bps.mv(xspress3.cam.num_images, num_pixels)
+        # one mv: the puts are issued concurrently and the plan waits on
+        # the slowest instead of paying each round trip in turn
+        yield from bps.mv(
+            xspress3.external_trig, True,
+            xspress3.hdf5.num_capture, num_pixels,
+            xspress3.total_points, num_pixels,
+            xspress3.cam.num_images, num_pixels,
+        )
 
     @bpp.reset_positions_decorator([mono.linear])
     @bpp.stage_decorator([sclr])
@@ -557,17 +808,14 @@ def E_fly(
 
             yield from bps.trigger_and_read([mono], name="row_ends")
 
-            for v in ["p1600=0", "p1600=1"]:
-                yield from bps.mv(dtt, v)
-                yield from bps.sleep(0.1)
+            yield from _dtt_program(["p1600=0", "p1600=1"], 0.1)
 
             # arm the Struck
             yield from bps.trigger(sclr, group=f"fly_energy_{y}")
             if xspress3 is not None:
                 yield from bps.trigger(xspress3, group=f"fly_energy_{y}")
 
-            # TODO: Figure out why this sleep is needed.
-            yield from bps.sleep(2)
+            yield from _wait_armed(2, xspress3=xspress3)
 
             # fly the motor
             yield from bps.abs_set(
@@ -637,7 +885,7 @@ def E_fly(
 '''
     if xspress3 is not None:
         print("Waiting for files... ...")
-        yield from bps.sleep(15)
+        yield from _wait_hdf5_flushed(xspress3)
         artifacts = e_fly_export(db[-1])
         pprint.pprint(artifacts)
     else:
@@ -704,10 +952,17 @@ def XANES_mapping(
     E_sections = np.array(E_sections)
     step_size = np.array(step_size)
 
-    ept = []
-    for ii in range(step_size.shape[0]):
-        ept = ept[0:-1]
-        ept = np.append(ept, np.linspace(E_sections[ii], E_sections[ii+1], np.int((E_sections[ii+1] - E_sections[ii])/step_size[ii])+1))
+    # size the merged table up front and write every section straight into
+    # its final slot; adjacent sections share an edge point, so each one
+    # after the first starts where the previous section's last point
+    # landed and overwrites it with the same value
+    counts = ((E_sections[1:] - E_sections[:-1]) / step_size).astype(int) + 1
+    offsets = np.concatenate(([0], np.cumsum(counts - 1)))
+    ept = np.empty(offsets[-1] + 1)
+    for ii in range(counts.shape[0]):
+        ept[offsets[ii] : offsets[ii] + counts[ii]] = np.linspace(
+            E_sections[ii], E_sections[ii + 1], counts[ii]
+        )
     #yield from bps.mv(sclr.set_mode,"counting")
 
     #yield from bps.sleep(0.1)
@@ -715,18 +970,16 @@ def XANES_mapping(
     #@bpp.baseline_decorator([mono, xy_stage])
     # TODO put in other meta data
 
-    e_back = yield from _get_v_with_dflt(mono.e_back, 1977.04)
-    energy_cal = yield from _get_v_with_dflt(mono.cal, 0.40118)
-
-
-    def _energy_to_linear(energy):
-        energy = np.asarray(energy)
-        return 28.2474 + 35.02333 * np.tan(
-            np.pi / 2 - 2 * np.arcsin(e_back / energy) + np.deg2rad(energy_cal)
-        )
+    # fresh reads once per stack; the motor resolutions are forwarded to
+    # every inner xy_fly call below so it never has to fetch them itself
+    _RES_CACHE.clear()
+    e_back = yield from _get_v_cached(mono.e_back, 1977.04)
+    energy_cal = yield from _get_v_cached(mono.cal, 0.40118)
+    _xmres = yield from _get_v_cached(xy_stage.x.mres, 0.0002)
+    _ymres = yield from _get_v_cached(xy_stage.y.mres, 0.0002)
 
     for E_e in ept:
-        l_start = _energy_to_linear([E_e])
+        l_start = _energy_to_linear_scalar(E_e, e_back, energy_cal)
         yield from bps.mv(mono.linear, l_start)
         yield from bps.sleep(2)
         yield from xy_fly(
@@ -740,5 +993,7 @@ def XANES_mapping(
             ystop=ystop,
             ystep_size=y_stepsize,
             xspress3=xs,
+            _xmres=_xmres,
+            _ymres=_ymres,
         )
 
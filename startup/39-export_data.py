@@ -69,8 +69,11 @@ def export_E_fly(scanID=-1):
     element = start["user_input"]["element"]
     roi = rois(element)
 
-    d = run["primary"]["data"]["fluor"].read()
-    If = np.sum(d[:, :, :, roi[0] : roi[1]], axis=-1)
+    # .read() hands back an xarray DataArray; the jitted _roi_sum from
+    # 30-fly_scans needs a plain ndarray (falls back to np.sum when
+    # numba is not installed)
+    d = np.asarray(run["primary"]["data"]["fluor"].read())
+    If = _roi_sum(d, int(roi[0]), int(roi[1]))
 
     primary_data = run["primary"]["data"]
     I_TEY = primary_data["fbratio"].read()[0]
@@ -94,29 +97,23 @@ def export_E_fly(scanID=-1):
     }
 
     for ii in range(If.shape[0]):
-        if If.shape[2] == 1:
-            df = pd.DataFrame(
-                {
-                    "#Energy": E,
-                    "Dwell_time": Dwell_time[ii + 1],
-                    "I0": I0[ii + 1],
-                    "I_TEY": I_TEY[ii + 1],
-                    "If_CH1": If[ii, :, 0],
-                    #'I_sclr_S': I_sclr_S[ii + 1]
-                }
-            )
-        else:
-            df = pd.DataFrame(
-                {
-                    "#Energy": E,
-                    "Dwell_time": Dwell_time[ii + 1],
-                    "I0": I0[ii + 1],
-                    "I_TEY": I_TEY[ii + 1],
-                    "If_CH1": If[ii, :, 0],
-                    "If_CH2": If[ii, :, 1],
-                    #'I_sclr_S': I_sclr_S[ii + 1]
-                }
-            )
+        # assemble the numeric table once and write it with np.savetxt --
+        # much cheaper than building a per-row DataFrame and paying
+        # to_csv's per-cell formatting, and the file layout is unchanged
+        n_points = len(E)
+        columns = [
+            E,
+            np.full(n_points, Dwell_time[ii + 1]),
+            np.full(n_points, I0[ii + 1]),
+            np.full(n_points, I_TEY[ii + 1]),
+            If[ii, :, 0],
+            #'I_sclr_S': I_sclr_S[ii + 1]
+        ]
+        column_header = "#Energy,Dwell_time,I0,I_TEY,If_CH1"
+        if If.shape[2] != 1:
+            columns.append(If[ii, :, 1])
+            column_header += ",If_CH2"
+        table = np.column_stack(columns)
 
         filepath = os.path.expanduser(
             f"~/Users/Data/{start['operator']}/{dt.date().isoformat()}/E_fly/"
@@ -128,8 +125,10 @@ def export_E_fly(scanID=-1):
             output_file.write("\n")
             output_file.write("\n")
             output_file.write("\n")
-
-        df.to_csv(filepath, header=True, index=False, mode="a")
+            np.savetxt(
+                output_file, table, fmt="%.10g", delimiter=",",
+                header=column_header, comments="",
+            )
         print(f"Data exported to {filepath}")
 
         filepath = os.path.expanduser(
@@ -142,8 +141,10 @@ def export_E_fly(scanID=-1):
             output_file.write("\n")
             output_file.write("\n")
             output_file.write("\n")
-
-        df.to_csv(filepath, header=True, index=False, mode="a")
+            np.savetxt(
+                output_file, table, fmt="%.10g", delimiter=",",
+                header=column_header, comments="",
+            )
         print(f"Data exported to {filepath}")
 
 
@@ -250,15 +251,13 @@ def export_Esmart_step(scanID=-1, scan_iter=0):
     e_back = yield from _get_v_with_dflt(mono.e_back, 1977.04)
     energy_cal = yield from _get_v_with_dflt(mono.cal, 0.40118)
 
-    def _linear_to_energy(linear):
-        linear = np.asarray(linear)
-        return e_back / np.sin(
-            np.deg2rad(45)
-            + 0.5 * np.arctan((28.2474 - linear) / 35.02333)
-            + np.deg2rad(energy_cal) / 2
-        )
-
-    E = _linear_to_energy(run["primary"]["data"]["mono_linear"].read())
+    # module-level helper from 30-fly_scans; it may be numba-compiled,
+    # so convert the DataArray that .read() returns to a plain ndarray
+    E = _linear_to_energy(
+        np.asarray(run["primary"]["data"]["mono_linear"].read()),
+        e_back,
+        energy_cal,
+    )
 
     # E = h.table()['mono_energy']
     I0 = run["primary"]["data"]["I0"].read()